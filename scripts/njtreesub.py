@@ -2,42 +2,63 @@
 
 # -*- coding: UTF-8 -*-
 
+import mmap
+import os
+import re
 import sys
 from argparse import ArgumentParser
 from hashlib import md5
+from itertools import islice
+
+# submatrix 生成的临时 ID 格式: "_" + 4 位大写十六进制 + 至少 4 位序号
+_SID2_PATTERN = re.compile(rb"_[0-9A-F]{4}\d{4,}")
+
+_BATCH_ROWS = 4096
+_WRITE_BUFFER_SIZE = 1 << 20
 
 
 def submatrix(mat_path: str, out_path: str, mapping_path: str):
     id_prefix = "_" + md5(mat_path.encode("utf8")).hexdigest().upper()[:4]  # 取前 4 个
+    sid2_fmt = id_prefix.encode("utf8") + b"%04d"  # 前缀只含 "_" 和十六进制字符, 可以直接拼进格式串
 
-    with open(mat_path, "r", encoding="utf8") as f_mat:
-        with open(out_path, "w", encoding="utf8") as f_out:
-            with open(mapping_path, "w", encoding="utf8") as f_mapping:
-                count_line = f_mat.readline()
-                f_out.write(count_line)
+    with open(mat_path, "rb") as f_mat, \
+            open(out_path, "wb", buffering=_WRITE_BUFFER_SIZE) as f_out, \
+            open(mapping_path, "wb", buffering=_WRITE_BUFFER_SIZE) as f_mapping:
+        count_line = f_mat.readline()
+        f_out.write(count_line)
 
-                count = int(count_line.rstrip("\n"))
-                print("Matrix line count: {}".format(count))
+        count = int(count_line)
+        print("Matrix line count: {}".format(count))
 
-                for i in range(count):
-                    line = f_mat.readline()
-                    sid, nums = line.split("\t")
-                    sid2 = "{}{:04d}".format(id_prefix, i)
+        # 按 _BATCH_ROWS 行一批, 整列生成 ID 后合并写入
+        for start in range(0, count, _BATCH_ROWS):
+            lines = list(islice(f_mat, min(_BATCH_ROWS, count - start)))
+            sids, nums = zip(*(line.split(b"\t") for line in lines))
+            sid2s = [sid2_fmt % i for i in range(start, start + len(lines))]
 
-                    f_out.write(sid2)
-                    f_out.write(nums)
-                    print(sid2, sid, sep="\t", file=f_mapping)
+            f_out.write(b"".join(map(bytes.__add__, sid2s, nums)))
+            f_mapping.write(b"".join(b"%s\t%s\n" % pair for pair in zip(sid2s, sids)))
 
 
 def restoretree(tree_path: str, mapping_path: str, out_tree_path: str):
-    with open(tree_path, "r", encoding="utf8") as f_tree:
-        tree_text = f_tree.read()
-    with open(mapping_path, "r", encoding="utf8") as f_mapping:
+    mapping = {}
+    with open(mapping_path, "rb") as f_mapping:
         for line in f_mapping:
-            sid2, sid = line.rstrip("\n").split("\t")
-            tree_text = tree_text.replace(sid2, sid)
-    with open(out_tree_path, "w", encoding="utf8") as f_out:
-        f_out.write(tree_text)
+            sid2, sid = line.rstrip(b"\r\n").split(b"\t")
+            mapping[sid2] = sid
+
+    with open(tree_path, "rb") as f_tree, open(out_tree_path, "wb") as f_out:
+        if os.fstat(f_tree.fileno()).st_size <= 0:
+            return  # 空文件无法 mmap
+
+        # 按需映射树文件, 边匹配边写出, 不在内存中构造替换后的完整文本
+        with mmap.mmap(f_tree.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            prev = 0
+            for m in _SID2_PATTERN.finditer(mm):
+                f_out.write(mm[prev:m.start()])
+                f_out.write(mapping.get(m.group(), m.group()))
+                prev = m.end()
+            f_out.write(mm[prev:])
 
 
 if __name__ == "__main__":
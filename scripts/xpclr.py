@@ -1,12 +1,32 @@
+import fnmatch
 import gzip
 import logging
+import os
+import pickle
 import re
+import shutil
+import struct
+import subprocess
 import sys
 from argparse import ArgumentParser
+from array import array
+from bisect import bisect_left
 from concurrent import futures
+from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import *
 
+try:
+    from isal import igzip as _gzip  # ISA-L 加速的 gzip 实现, 可选依赖
+except ImportError:
+    _gzip = gzip
+
+try:
+    import pysam  # htslib 的 Python 绑定, 可选依赖
+except ImportError:
+    pysam = None
+
 __version__ = "0.9.7"
 
 __doc__ = f"""XPCLR shell 脚本生成工具.
@@ -29,14 +49,17 @@ __doc__ = f"""XPCLR shell 脚本生成工具.
 可选参数:
     --chrid-list (路径): 一个文本文件, 有一列数据, 是需要进行 split 操作的染色体 id, 与 vcf 文件中保持一致. 默认为 `chrid.list`.
     --interval (整数): 进行 split 操作时, 每个划分文件最大的行数. 默认为 `200000`.
+    --interval-bp (整数): 进行 split 操作时, 改为按基因组坐标划分, 每个划分文件覆盖的碱基数, 设置后忽略 `--interval`. 默认为 `0`, 即按行数划分.
 
 工具路径参数:
     --bcftools (路径): bcftools, 默认为 `bcftools`.
-    --vcftools (路径): vcftools, 默认为 `vcftools`.
+    --vcftools (路径): 已弃用, overlap 步骤已改用 `bcftools isec` 和 `bcftools view -T`, 该参数不再生效, 仅为兼容旧的命令行保留.
     --tabix (路径): tabix, 默认为 `tabix`.
+    --bgzip (路径): bgzip, 默认为 `bgzip`.
     --perl (路径): perl, 默认为 `perl`.
     --perl-script (路径): 用于 geno 操作的 perl 脚本, 默认为 `/ldfssz1/ST_EARTH/P18Z10200N0148/P18Z10200N0148_LETTUCE/final_combine/dp2-50/29.xp-clr/vcf2geno.v20200716.pl`.
     --xpclr (路径): XPCLR, 默认为 `/hwfssz1/ST_EARTH/Reference/ST_AGRIC/USER/liuxinjiang/liuxinjiang/APP/software/XPCLR/bin/XPCLR`
+    --bcftools-threads (整数): 生成的 bcftools filter/view/+scatter 命令使用的压缩/解压线程数, 默认为 `4`.
 
 运行参数:
     下列参数指定生成哪些步骤的脚本, 可以组合使用.
@@ -46,6 +69,10 @@ __doc__ = f"""XPCLR shell 脚本生成工具.
     --run-split: 生成 split 操作脚本.
     --run-genomap: 生成 geno 和 map 操作脚本.
     --run-xpclr: 生成 xpclr 操作脚本.
+
+执行参数:
+    --execute: 生成脚本后立即按步骤顺序执行, 默认只生成脚本.
+    --jobs (整数): 执行时同一步骤内并行运行的脚本数, 默认为 `4`.
 """
 
 # 全局 logger
@@ -67,28 +94,99 @@ logger.addHandler(_err_hdler)
 logger.addHandler(_out_hdler)
 
 
-def get_chrpos_from_vcfgz(vcfgz_path: Path) -> Dict[str, List[str]]:
-    """
-    Returns:
-        {"chrid": [1234, 5678, ...]}
+# gzip 回退读取时每次解压的块大小
+_READ_CHUNK_SIZE = 128 * 1024
+
+# 位置信息使用 32 位无符号整数数组保存, 比 List[str] 节省约 10 倍内存
+_POS_TYPECODE = "I"
+
+_CHRNUM_RE = re.compile(r"\d+")
+
+# split 步骤输出文件名: {chrid}-{lstart}-{lend}.{name}
+_SPLIT_NAME_RE = re.compile(r"^(.+)-\d+-\d+\.(.+)$")
+
+# 生成脚本主要是小文件的创建和写入, 使用线程池并行, 线程数可以多于 CPU 核数
+_SCRIPT_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+
+def get_chrnum(chrid: str) -> str:
+    """Return the first run of digits in `chrid`, e.g. `Chr05` -> `05`."""
+
+    m = _CHRNUM_RE.search(chrid)
+    return m.group() if m else ""
+
+
+def _has_index(vcfgz_path: Path) -> bool:
+    return any(vcfgz_path.with_name(vcfgz_path.name + suffix).is_file() for suffix in (".tbi", ".csi"))
+
+
+def _get_chrpos_from_bcftools(vcfgz_path: Path, bcftools: str, chrids: Sequence[str] = None) -> Dict[str, array]:
+    """使用 `bcftools query` 读取位置信息, 由 htslib 负责解压和解析.
+
+    如果指定了 `chrids` 且文件有索引, 通过 `-r` 只读取这些染色体.
     """
 
     chr_pos = {}
     last_chrid = None
     positions = []
-    with gzip.open(vcfgz_path, "rt") as f:
-        for line in f:
-            if line.startswith("#"):
-                continue
+    # NOTE: `bcftools query` 不支持 `--threads`
+    cmd = [bcftools, "query", "-f", "%CHROM\t%POS\n"]
+    if chrids and _has_index(vcfgz_path):
+        cmd.extend(["-r", ",".join(chrids)])
+    cmd.append(str(vcfgz_path))
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=1 << 20) as proc:
+        for line in proc.stdout:
+            # int() 会忽略行尾换行符, 无需 rstrip
+            tab = line.find(b"\t")
+            chrid, pos = line[:tab], line[tab + 1:]
+            if chrid != last_chrid:
+                if last_chrid is not None and len(positions) > 0:
+                    chr_pos[last_chrid.decode()] = positions
+                last_chrid = chrid
+                positions = array(_POS_TYPECODE, [int(pos)])
+            else:
+                positions.append(int(pos))
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+    if last_chrid is not None and len(positions) > 0:
+        chr_pos[last_chrid.decode()] = positions
+
+    return chr_pos
 
-            chrid, pos, *_ = line.split("\t")
+
+def _get_chrpos_from_pysam(vcfgz_path: Path, chrids: Sequence[str] = None, threads: int = 2) -> Dict[str, array]:
+    """使用 `pysam.VariantFile` 读取位置信息, 由 htslib 负责解压和解析, 在找不到 bcftools 时使用.
+
+    如果指定了 `chrids` 且文件有索引, 只读取这些染色体.
+    """
+
+    chr_pos = {}
+    with pysam.VariantFile(str(vcfgz_path), "r", threads=threads) as vf:
+        if chrids and _has_index(vcfgz_path):
+            for chrid in chrids:
+                if chrid not in vf.index:
+                    continue
+                positions = array(_POS_TYPECODE, (rec.pos for rec in vf.fetch(chrid)))
+                if len(positions) > 0:
+                    chr_pos[chrid] = positions
+            return chr_pos
+
+        wanted = None if not chrids else set(chrids)
+        last_chrid = None
+        positions = []
+        for rec in vf:
+            chrid = rec.chrom
+            if wanted is not None and chrid not in wanted:
+                continue
             if chrid != last_chrid:
                 if last_chrid is not None and len(positions) > 0:
                     chr_pos[last_chrid] = positions
                 last_chrid = chrid
-                positions = [pos]
+                positions = array(_POS_TYPECODE, [rec.pos])
             else:
-                positions.append(pos)
+                positions.append(rec.pos)
 
     if last_chrid is not None and len(positions) > 0:
         chr_pos[last_chrid] = positions
@@ -96,25 +194,216 @@ def get_chrpos_from_vcfgz(vcfgz_path: Path) -> Dict[str, List[str]]:
     return chr_pos
 
 
-def get_chrpos_from_vcfgz_files(vcfgz_paths: List[Path]) -> Dict[str, List[str]]:
-    """
+def _get_first_record_voffset(vcfgz_path: Path) -> Optional[int]:
+    """从 `.tbi` 索引中读取第一条记录的 BGZF 虚拟偏移, 用于跳过整个 header.
+
     Returns:
-        {"chrid": [1234, 5678, ...]}
+        虚拟偏移 (压缩块偏移 << 16 | 块内偏移), 索引不存在或已过期时返回 None.
     """
 
-    tasks: List[futures.Future[Dict[str, List[str]]]] = []
-    with futures.ProcessPoolExecutor(len(vcfgz_paths)) as executor:
-        for p in vcfgz_paths:
-            fu = executor.submit(get_chrpos_from_vcfgz, p)
-            tasks.append(fu)
+    tbi_path = vcfgz_path.with_name(vcfgz_path.name + ".tbi")
+    if not tbi_path.is_file() or tbi_path.stat().st_mtime < vcfgz_path.stat().st_mtime:
+        return None
+
+    data = _gzip.decompress(tbi_path.read_bytes())
+    if data[:4] != b"TBI\1":
+        return None
+
+    # n_ref, format, col_seq, col_beg, col_end, meta, skip, l_nm
+    n_ref, *_, l_nm = struct.unpack_from("<8i", data, 4)
+    offset = 4 + 8 * 4 + l_nm
+
+    first_voffset = None
+    for _ in range(n_ref):
+        (n_bin,) = struct.unpack_from("<i", data, offset)
+        offset += 4
+        for _ in range(n_bin):
+            bin_id, n_chunk = struct.unpack_from("<Ii", data, offset)
+            offset += 8
+            if bin_id != 37450 and n_chunk > 0:  # 37450 为存放统计信息的伪 bin
+                (chunk_beg,) = struct.unpack_from("<Q", data, offset)
+                if first_voffset is None or chunk_beg < first_voffset:
+                    first_voffset = chunk_beg
+            offset += n_chunk * 16
+        (n_intv,) = struct.unpack_from("<i", data, offset)
+        offset += 4 + n_intv * 8
+
+    return first_voffset
+
+
+def _get_chrpos_from_gzip(vcfgz_path: Path, chrids: Sequence[str] = None) -> Dict[str, array]:
+    """使用 Python `gzip` 分块读取位置信息, 仅在找不到 bcftools 且没有安装 pysam 时使用.
+
+    如果存在 `.tbi` 索引, 直接定位到第一条记录, 跳过 header 部分.
+    如果指定了 `chrids`, 其余染色体的记录不解析位置.
+    """
+
+    voffset = _get_first_record_voffset(vcfgz_path)
+    wanted = None if not chrids else {c.encode() for c in chrids}
 
     chr_pos = {}
-    for t in futures.as_completed(tasks):
-        chr_pos.update(t.result())
+    last_chrid = None
+    positions = []
+    with vcfgz_path.open("rb") as f_raw:
+        if voffset is not None:
+            f_raw.seek(voffset >> 16)
+        with _gzip.open(f_raw, "rb") as f_gz:
+            if voffset is not None:
+                f_gz.read(voffset & 0xFFFF)
+
+            # 按 _READ_CHUNK_SIZE 大块读取, 末尾不完整的行留到下一块; 读到结尾时 remainder 即最后一行
+            remainder = b""
+            while True:
+                buf = f_gz.read(_READ_CHUNK_SIZE)
+                lines = (remainder + buf).split(b"\n")
+                remainder = lines.pop() if buf else b""
+
+                for line in lines:
+                    if not line or line.startswith(b"#"):
+                        continue
+
+                    # 只切出前两列, 不拆分整行的样本列
+                    tab = line.find(b"\t")
+                    chrid = line[:tab]
+                    if wanted is not None and chrid not in wanted:
+                        continue
+                    pos = line[tab + 1:line.find(b"\t", tab + 1)]
+                    if chrid != last_chrid:
+                        if last_chrid is not None and len(positions) > 0:
+                            chr_pos[last_chrid.decode()] = positions
+                        last_chrid = chrid
+                        positions = array(_POS_TYPECODE, [int(pos)])
+                    else:
+                        positions.append(int(pos))
+
+                if not buf:
+                    break
+
+    if last_chrid is not None and len(positions) > 0:
+        chr_pos[last_chrid.decode()] = positions
+
+    return chr_pos
+
+
+def _get_chrpos_cache_path(vcfgz_path: Path) -> Path:
+    return vcfgz_path.with_name(vcfgz_path.name + ".chrpos.pkl")
+
+
+def _load_cached_chrpos(vcfgz_path: Path, key: tuple) -> Optional[Dict[str, array]]:
+    """读取缓存的位置信息, 缓存不存在, 已损坏或 key 不一致时返回 None."""
+
+    try:
+        with _get_chrpos_cache_path(vcfgz_path).open("rb") as f:
+            cached_key, chr_pos = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return None
+
+    return chr_pos if cached_key == key else None
+
+
+def _save_cached_chrpos(vcfgz_path: Path, key: tuple, chr_pos: Dict[str, array]):
+    """先写临时文件再替换, 避免留下写了一半的缓存."""
+
+    cache_path = _get_chrpos_cache_path(vcfgz_path)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_path.open("wb") as f:
+            pickle.dump((key, chr_pos), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("无法写入位置信息缓存 %s: %s", cache_path, e)
+        tmp_path.unlink(missing_ok=True)
 
+
+def get_chrpos_from_vcfgz(vcfgz_path: Path, bcftools: Path = "bcftools", chrids: Sequence[str] = None, threads: int = 2) -> Dict[str, array]:
+    """结果缓存在同目录的 `*.chrpos.pkl` 文件中, 文件大小和修改时间不变时直接读取缓存.
+
+    Args:
+        chrids: 只读取这些染色体, 为 None 时读取全部.
+        threads: pysam 解压 BGZF 块使用的线程数, bcftools 和 gzip 读取时不使用.
+
+    Returns:
+        {"chrid": array("I", [1234, 5678, ...])}
+    """
+
+    stat = vcfgz_path.stat()
+    key = (stat.st_size, stat.st_mtime_ns, tuple(chrids) if chrids else None)
+    chr_pos = _load_cached_chrpos(vcfgz_path, key)
+    if chr_pos is not None:
+        return chr_pos
+
+    bcftools = shutil.which(bcftools)
+    if bcftools is not None:
+        chr_pos = _get_chrpos_from_bcftools(vcfgz_path, bcftools, chrids)
+    elif pysam is not None:
+        logger.info("未找到 bcftools, 使用 pysam 读取 %s", vcfgz_path)
+        chr_pos = _get_chrpos_from_pysam(vcfgz_path, chrids, threads)
+    else:
+        logger.warning("未找到 bcftools 和 pysam, 使用 gzip 读取 %s", vcfgz_path)
+        chr_pos = _get_chrpos_from_gzip(vcfgz_path, chrids)
+
+    _save_cached_chrpos(vcfgz_path, key, chr_pos)
     return chr_pos
 
 
+def get_chrpos_from_vcfgz_pairs(pop1_paths: List[Path], pop2_paths: List[Path], bcftools: Path = "bcftools", chrids: Sequence[str] = None) -> Tuple[Dict[str, array], Dict[str, array]]:
+    """两个 pop 的文件放在同一个进程池中同时读取.
+
+    Returns:
+        ({"chrid": array("I", [1234, 5678, ...])}, {"chrid": array("I", [1234, 5678, ...])})
+    """
+
+    # 进程数不超过 CPU 核数, map 按提交顺序返回结果, 合并顺序保持确定
+    # 文件数少于 CPU 核数时, 剩余的核分给每个文件的 BGZF 解压线程 (仅 pysam 读取时使用)
+    vcfgz_paths = list(pop1_paths) + list(pop2_paths)
+    cpu_count = os.cpu_count() or 1
+    workers = min(len(vcfgz_paths), cpu_count)
+    threads = max(1, cpu_count // workers)
+    n = len(vcfgz_paths)
+    with futures.ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(get_chrpos_from_vcfgz, vcfgz_paths, [bcftools] * n, [chrids] * n, [threads] * n, chunksize=1))
+
+    chr_pos1 = {}
+    for r in results[:len(pop1_paths)]:
+        chr_pos1.update(r)
+
+    chr_pos2 = {}
+    for r in results[len(pop1_paths):]:
+        chr_pos2.update(r)
+
+    return chr_pos1, chr_pos2
+
+
+def _write_if_changed(path: Path, content: str) -> bool:
+    """内容与已有文件相同时不重写, 保留原文件的修改时间; 否则先写临时文件再替换.
+
+    Returns:
+        是否写入了文件.
+    """
+
+    data = content.encode("utf8")
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+@dataclass
+class Chunk:
+    """一个数据文件在 filter 和 overlap 步骤中对应的各个路径."""
+
+    name: str
+    data_path: Path
+    filter_path: Path
+    overlap_path: Path
+
+
 class XPCLR:
     DATA_SUFFIX = ".vcf.gz"
     FILTER_SUFFIX = ".filter.vcf.gz"
@@ -129,11 +418,16 @@ class XPCLR:
 
         # command line tools
         self.bcftools = Path(args.bcftools)
-        self.vcftools = Path(args.vcftools)
         self.tabix = Path(args.tabix)
+        self.bgzip = Path(args.bgzip)
         self.perl = Path(args.perl)
         self.perl_script = Path(args.perl_script)
         self.xpclr = Path(args.xpclr)
+        self.bcftools_threads = int(args.bcftools_threads)
+
+        # execute args
+        self.execute = bool(args.execute)
+        self.jobs = int(args.jobs)
 
         # run args
         self.pop1 = str(args.pop1)
@@ -148,6 +442,102 @@ class XPCLR:
         self.genomap_dir = self.root_dir.joinpath(args.genomap_dir)
         self.xpclr_dir = self.root_dir.joinpath(args.xpclr_dir)
 
+        # 已生成但尚未执行的脚本, 按步骤顺序记录
+        self.script_paths: Dict[str, List[Path]] = {}
+        # 作业数组脚本及其任务数
+        self.script_tasks: Dict[Path, int] = {}
+
+    @cached_property
+    def chrid_list(self) -> List[str]:
+        """`--chrid-list` 中的染色体 id, 忽略空行和重复行, 首次使用时读取."""
+
+        lines = (line.strip() for line in Path(self.args.chrid_list).read_text().splitlines())
+        return list(dict.fromkeys(line for line in lines if line))
+
+    @cached_property
+    def interval(self) -> int:
+        return int(self.args.interval)
+
+    def _record_scripts(self, stage: str, paths: Iterable[Path]):
+        """Record generated scripts under `stage` for `execute_scripts`.
+
+        Only called from the main thread, so stages are recorded in the order they were generated.
+        """
+
+        self.script_paths.setdefault(stage, []).extend(paths)
+
+    @staticmethod
+    def _write_script(path: Path, lines: List[str]) -> Path:
+        """Write all `lines` of a script in one call."""
+
+        _write_if_changed(path, "\n".join(lines) + "\n")
+        return path
+
+    def _write_array_script(self, path: Path, tasks: List[List[str]]) -> Path:
+        """Write one SGE/SLURM job array script, task `i` (1-based) runs the commands in `tasks[i - 1]`."""
+
+        task_id = "${SGE_TASK_ID:-$SLURM_ARRAY_TASK_ID}"
+        lines = [
+            f"# 作业数组脚本, 共 {len(tasks)} 个任务",
+            f"# 提交方式: `qsub -t 1-{len(tasks)} {path.name}` 或 `sbatch --array=1-{len(tasks)} {path.name}`",
+            f'case "{task_id}" in',
+        ]
+        for i, commands in enumerate(tasks, 1):
+            lines.append(f"{i})")
+            lines.extend(f"    {command}" for command in commands)
+            lines.append("    ;;")
+        lines.append("*)")
+        lines.append(f'    echo "未知的任务编号: {task_id}" >&2')
+        lines.append("    exit 1")
+        lines.append("    ;;")
+        lines.append("esac")
+
+        self.script_tasks[path] = len(tasks)
+        return self._write_script(path, lines)
+
+    @staticmethod
+    def _execute_script(path: Path, task_id: int = None) -> int:
+        """在脚本所在目录下执行脚本, 输出写入同名 `.log` 文件.
+
+        作业数组脚本的每个任务单独执行, 任务编号通过 `SGE_TASK_ID` 传入, 输出写入 `.{task_id}.log` 文件.
+        """
+
+        if task_id is None:
+            log_path, env = path.with_suffix(".log"), None
+        else:
+            log_path, env = path.with_suffix(f".{task_id}.log"), {**os.environ, "SGE_TASK_ID": str(task_id)}
+
+        with log_path.open("wb") as f_log:
+            return subprocess.run(["bash", "-e", "-o", "pipefail", path.name], cwd=path.parent, env=env, stdout=f_log, stderr=subprocess.STDOUT).returncode
+
+    def execute_scripts(self):
+        """按步骤顺序执行已生成的脚本, 同一步骤内的脚本并行执行."""
+
+        for stage, script_paths in self.script_paths.items():
+            # 作业数组脚本展开为每个任务一次执行
+            jobs: List[Tuple[Path, Optional[int]]] = []
+            for p in script_paths:
+                if p in self.script_tasks:
+                    jobs.extend((p, i) for i in range(1, self.script_tasks[p] + 1))
+                else:
+                    jobs.append((p, None))
+
+            logger.info("开始执行 %s 步骤脚本共 %d 个任务, 并行数 %d", stage, len(jobs), self.jobs)
+            with futures.ThreadPoolExecutor(self.jobs) as executor:
+                returncodes = list(executor.map(self._execute_script, *zip(*jobs)))
+
+            failed_jobs = [job for job, code in zip(jobs, returncodes) if code != 0]
+            if len(failed_jobs) > 0:
+                logger.error("%s 步骤有 %d 个任务执行失败", stage, len(failed_jobs))
+                for p, task_id in failed_jobs:
+                    logger.error("%s", p.with_suffix(".log" if task_id is None else f".{task_id}.log").resolve())
+                exit(1)
+
+            logger.info("%s 步骤脚本已全部执行完成", stage)
+
+        self.script_paths.clear()
+        self.script_tasks.clear()
+
     def find_file_pairs(self, folder: Path, pattern: str) -> Tuple[List[Path], List[Path]]:
         """Return sorted file pairs."""
 
@@ -155,17 +545,26 @@ class XPCLR:
 
         pop1_paths: List[Path] = []
         pop2_paths: List[Path] = []
-        for p in folder.glob(pattern):
-            if not p.is_file():
-                continue
 
-            if self.pop1 in p.name:
-                pop1_paths.append(p)
-            elif self.pop2 in p.name:
-                pop2_paths.append(p)
-            else:
-                logger.error("发现了未知 pop 类型文件: %s, 不属于 {%s, %s}", p.resolve(), self.pop1, self.pop2)
-                exit(1)
+        # pop 标识到结果列表的映射, 按 pop1, pop2 的顺序匹配
+        markers = {self.pop1: pop1_paths, self.pop2: pop2_paths}
+        if not folder.is_dir():
+            logger.error("目录 %s 不存在", folder.resolve())
+            exit(1)
+
+        # NOTE: scandir 的 is_file 使用目录项自带的文件类型, 只有符号链接才需要额外 stat
+        with os.scandir(folder) as it:
+            for entry in it:
+                if not fnmatch.fnmatchcase(entry.name, pattern) or not entry.is_file():
+                    continue
+
+                p = Path(entry.path)
+                marker = next((m for m in markers if m in entry.name), None)
+                if marker is not None:
+                    markers[marker].append(p)
+                else:
+                    logger.error("发现了未知 pop 类型文件: %s, 不属于 {%s, %s}", p.resolve(), self.pop1, self.pop2)
+                    exit(1)
 
         if len(pop1_paths) != len(pop2_paths):
             logger.error("文件数不相等")
@@ -194,19 +593,55 @@ class XPCLR:
 
         return pop1_paths, pop2_paths
 
-    def _generate_script_filter(self, out_dir: Path, in_path: Path) -> Path:
-        name = in_path.name[:-len(self.DATA_SUFFIX)]
+    def _make_chunk(self, path: Path, suffix: str) -> Chunk:
+        """Derive the chunk name from `path` once and build all of its step paths.
 
-        tmp_vcf_path = out_dir.joinpath(f"{name}.filter.vcf")
-        filter_path = out_dir.joinpath(f"{name}{self.FILTER_SUFFIX}")
+        `path` itself is kept as the data path (`DATA_SUFFIX`) or filter path (`FILTER_SUFFIX`),
+        only the paths of the following steps are derived from the step directories.
+        """
+
+        name = path.name[:-len(suffix)]
+        return Chunk(
+            name=name,
+            data_path=path if suffix == self.DATA_SUFFIX else self.data_dir.joinpath(f"{name}{self.DATA_SUFFIX}"),
+            filter_path=path if suffix == self.FILTER_SUFFIX else self.filter_dir.joinpath(f"{name}{self.FILTER_SUFFIX}"),
+            overlap_path=self.overlap_dir.joinpath(f"{name}{self.OVERLAP_SUFFIX}"),
+        )
 
-        with out_dir.joinpath(f"{name}.filter.sh").open("w", encoding="utf8") as f:
-            print(f"{self.bcftools} filter -e 'F_MISSING > 0.5 || MAC < 2' {in_path} > {tmp_vcf_path}", file=f)
-            print(f"{self.bcftools} view -Oz -o {filter_path} {tmp_vcf_path}", file=f)
-            print(f"{self.tabix} -p vcf {filter_path}", file=f)
-            print(f"rm {tmp_vcf_path}", file=f)
+    def _generate_script_filter(self, chunk: Chunk) -> Path:
+        """Write the filter script of `chunk` and return the script path, the output is `chunk.filter_path`."""
 
-        return filter_path
+        return self._write_script(self.filter_dir.joinpath(f"{chunk.name}.filter.sh"), [
+            f"{self.bcftools} filter --threads {self.bcftools_threads} -Ou -e 'F_MISSING > 0.5 || MAC < 2' {chunk.data_path} | {self.bcftools} view --threads {self.bcftools_threads} -Oz -o {chunk.filter_path}",
+            f"{self.tabix} -p vcf {chunk.filter_path}",
+        ])
+
+    def _generate_script_overlap(self, chunk1: Chunk, chunk2: Chunk) -> Path:
+        """Write the overlap script of a chunk pair and return the script path, the outputs are their `overlap_path`."""
+
+        overlap_dir = self.overlap_dir
+        name1, name2 = chunk1.name, chunk2.name
+        p1, p2 = chunk1.filter_path, chunk2.filter_path
+
+        overlap_list_path = overlap_dir.joinpath(f"{name1}_{name2}.overlap.list.gz")
+
+        overlap_path1 = chunk1.overlap_path
+        overlap_path2 = chunk2.overlap_path
+
+        return self._write_script(overlap_dir.joinpath(f"{name1}_{name2}.overlap.sh"), [
+            # NOTE: `-c all` 只按 CHROM 和 POS 取交集, 不要求 REF/ALT 相同, 每个位置只输出一行
+            # 位点列表只保留 CHROM 和 POS 两列, 压缩并建立索引, 便于核对
+            f"{self.bcftools} isec -n=2 -c all {p1} {p2} | cut -f1,2 | {self.bgzip} -c > {overlap_list_path}",
+            f"{self.tabix} -f -s1 -b2 -e2 {overlap_list_path}",
+
+            # NOTE: isec 在同一位置有多条记录时只输出第一条, 因此按位点列表从各自文件中提取,
+            # 保留同一位置的全部记录 (例如同一 POS 上的 SNP 和 indel), 与原先 `vcftools --positions` 一致
+            f"{self.bcftools} view --threads {self.bcftools_threads} -T {overlap_list_path} -Oz -o {overlap_path1} {p1}",
+            f"{self.tabix} -p vcf {overlap_path1}",
+
+            f"{self.bcftools} view --threads {self.bcftools_threads} -T {overlap_list_path} -Oz -o {overlap_path2} {p2}",
+            f"{self.tabix} -p vcf {overlap_path2}",
+        ])
 
     def generate_scripts_filter(self, pop1_data_paths: List[Path] = None, pop2_data_paths: List[Path] = None) -> Tuple[List[Path], List[Path]]:
         if pop1_data_paths is None or pop2_data_paths is None:
@@ -214,16 +649,15 @@ class XPCLR:
 
         filter_dir = self.filter_dir
         filter_dir.mkdir(parents=True, exist_ok=True)
-        print("在目录 %s 生成 filter 步骤脚本", filter_dir.resolve())
+        logger.info("在目录 %s 生成 filter 步骤脚本", filter_dir.resolve())
 
-        pop1_filter_paths: List[Path] = []
-        pop2_filter_paths: List[Path] = []
-        for p1, p2 in zip(pop1_data_paths, pop2_data_paths):
-            path = self._generate_script_filter(filter_dir, p1)
-            pop1_filter_paths.append(path)
+        chunk_pairs = [(self._make_chunk(p1, self.DATA_SUFFIX), self._make_chunk(p2, self.DATA_SUFFIX)) for p1, p2 in zip(pop1_data_paths, pop2_data_paths)]
+        with futures.ThreadPoolExecutor(_SCRIPT_WORKERS) as executor:
+            fs = [executor.submit(self._generate_script_filter, chunk) for chunk_pair in chunk_pairs for chunk in chunk_pair]
+        self._record_scripts("filter", [f.result() for f in fs])
 
-            path = self._generate_script_filter(filter_dir, p2)
-            pop2_filter_paths.append(path)
+        pop1_filter_paths: List[Path] = [chunk1.filter_path for chunk1, _ in chunk_pairs]
+        pop2_filter_paths: List[Path] = [chunk2.filter_path for _, chunk2 in chunk_pairs]
 
         logger.info("已生成 pop1(%s) %d 个 filter 步骤脚本", self.pop1, len(pop1_filter_paths))
         for p in pop1_filter_paths:
@@ -242,76 +676,137 @@ class XPCLR:
         overlap_dir.mkdir(parents=True, exist_ok=True)
         logger.info("在目录 %s 下生成 overlap 步骤脚本", overlap_dir.resolve())
 
-        pop1_overlap_paths: List[Path] = []
-        pop2_overlap_paths: List[Path] = []
-        for p1, p2 in zip(pop1_filter_paths, pop2_filter_paths):
-            name1 = p1.name[:-len(self.FILTER_SUFFIX)]
-            name2 = p2.name[:-len(self.FILTER_SUFFIX)]
+        chunk_pairs = [(self._make_chunk(p1, self.FILTER_SUFFIX), self._make_chunk(p2, self.FILTER_SUFFIX)) for p1, p2 in zip(pop1_filter_paths, pop2_filter_paths)]
+        with futures.ThreadPoolExecutor(_SCRIPT_WORKERS) as executor:
+            fs = [executor.submit(self._generate_script_overlap, chunk1, chunk2) for chunk1, chunk2 in chunk_pairs]
+        self._record_scripts("overlap", [f.result() for f in fs])
+
+        pop1_overlap_paths: List[Path] = [chunk1.overlap_path for chunk1, _ in chunk_pairs]
+        pop2_overlap_paths: List[Path] = [chunk2.overlap_path for _, chunk2 in chunk_pairs]
 
-            list_path1 = overlap_dir.joinpath(f"{name1}.list")
-            list_path2 = overlap_dir.joinpath(f"{name2}.list")
-            overlap_list_path = overlap_dir.joinpath(f"{name1}_{name2}.overlap.list")
+        logger.info("已生成 pop1(%s) %d 个 overlap 步骤脚本", self.pop1, len(pop1_overlap_paths))
+        for p in pop1_overlap_paths:
+            logger.info("%s", p.resolve())
+        logger.info("已生成 pop2(%s) %d 个 overlap 步骤脚本", self.pop2, len(pop2_overlap_paths))
+        for p in pop2_overlap_paths:
+            logger.info("%s", p.resolve())
+
+        return pop1_overlap_paths, pop2_overlap_paths
 
-            tmp_vcf_path1 = overlap_dir.joinpath(f"{name1}.overlap.recode.vcf")
-            tmp_vcf_path2 = overlap_dir.joinpath(f"{name2}.overlap.recode.vcf")
+    def generate_scripts_filter_overlap(self, pop1_data_paths: List[Path] = None, pop2_data_paths: List[Path] = None) -> Tuple[List[Path], List[Path]]:
+        """同时运行 filter 和 overlap 步骤时, 对每对数据文件只遍历一次, 依次生成两个步骤的脚本."""
 
-            overlap_path1 = overlap_dir.joinpath(f"{name1}{self.OVERLAP_SUFFIX}")
-            overlap_path2 = overlap_dir.joinpath(f"{name2}{self.OVERLAP_SUFFIX}")
+        if pop1_data_paths is None or pop2_data_paths is None:
+            pop1_data_paths, pop2_data_paths = self.find_file_pairs(self.data_dir, "*" + self.DATA_SUFFIX)
 
-            with overlap_dir.joinpath(f"{name1}_{name2}.overlap.sh").open("w", encoding="utf8") as f:
-                print(f"{self.bcftools} query -f '%CHROM\\t%POS]\\n' {p1} > {list_path1}", file=f)
-                print(f"{self.bcftools} query -f '%CHROM\\t%POS]\\n' {p2} > {list_path2}", file=f)
-                print(f"awk 'NR==FNR{{a[$1,$2]; next}} ($1,$2) in a' {list_path1} {list_path2} > {overlap_list_path}", file=f)
+        self.filter_dir.mkdir(parents=True, exist_ok=True)
+        self.overlap_dir.mkdir(parents=True, exist_ok=True)
+        logger.info("在目录 %s 和 %s 下生成 filter 和 overlap 步骤脚本", self.filter_dir.resolve(), self.overlap_dir.resolve())
 
-                print(f"{self.vcftools} --gzvcf {p1} --positions {overlap_list_path} --recode --out {name1}.overlap", file=f)
-                print(f"{self.bcftools} view -Oz -o {overlap_path1} {tmp_vcf_path1}", file=f)
-                print(f"{self.tabix} -p vcf {overlap_path1}", file=f)
-                print(f"rm {tmp_vcf_path1}", file=f)
+        chunk_pairs = [(self._make_chunk(p1, self.DATA_SUFFIX), self._make_chunk(p2, self.DATA_SUFFIX)) for p1, p2 in zip(pop1_data_paths, pop2_data_paths)]
+        filter_fs = []
+        overlap_fs = []
+        with futures.ThreadPoolExecutor(_SCRIPT_WORKERS) as executor:
+            for chunk1, chunk2 in chunk_pairs:
+                filter_fs.append(executor.submit(self._generate_script_filter, chunk1))
+                filter_fs.append(executor.submit(self._generate_script_filter, chunk2))
+                overlap_fs.append(executor.submit(self._generate_script_overlap, chunk1, chunk2))
 
-                print(f"{self.vcftools} --gzvcf {p2} --positions {overlap_list_path} --recode --out {name2}.overlap", file=f)
-                print(f"{self.bcftools} view -Oz -o {overlap_path2} {tmp_vcf_path2}", file=f)
-                print(f"{self.tabix} -p vcf {overlap_path2}", file=f)
-                print(f"rm {tmp_vcf_path2}", file=f)
+        # NOTE: 在主线程中按 filter, overlap 的顺序记录, 保证执行时 filter 步骤先于 overlap 步骤
+        self._record_scripts("filter", [f.result() for f in filter_fs])
+        self._record_scripts("overlap", [f.result() for f in overlap_fs])
 
-            pop1_overlap_paths.append(overlap_path1)
-            pop2_overlap_paths.append(overlap_path2)
+        pop1_overlap_paths: List[Path] = [chunk1.overlap_path for chunk1, _ in chunk_pairs]
+        pop2_overlap_paths: List[Path] = [chunk2.overlap_path for _, chunk2 in chunk_pairs]
 
-        logger.info("已生成 pop1(%s) %d 个 overlap 步骤脚本", self.pop1, len(pop1_overlap_paths))
+        logger.info("已生成 pop1(%s) %d 组 filter 和 overlap 步骤脚本", self.pop1, len(pop1_overlap_paths))
         for p in pop1_overlap_paths:
             logger.info("%s", p.resolve())
-        logger.info("已生成 pop2(%s) %d 个 overlap 步骤脚本", self.pop2, len(pop2_overlap_paths))
+        logger.info("已生成 pop2(%s) %d 组 filter 和 overlap 步骤脚本", self.pop2, len(pop2_overlap_paths))
         for p in pop2_overlap_paths:
             logger.info("%s", p.resolve())
 
         return pop1_overlap_paths, pop2_overlap_paths
 
-    def _generate_script_split(self, out_dir: Path, in_path: Path, chrid: str, positions: List[int], interval: int) -> List[Path]:
-        name = in_path.name[:-len(self.OVERLAP_SUFFIX)]
+    def _generate_script_split(self, out_dir: Path, in_path: Path, chrid: str, positions: array, interval: int, interval_bp: int = 0) -> Tuple[List[Path], List[str]]:
+        """Write the regions file of `in_path` and return its split paths and the commands of its array task.
 
-        split_paths = []
-        with out_dir.joinpath(f"{'chr' + chrid if chrid[0].isdigit() else chrid}.{name}.split.sh").open("w", encoding="utf8") as f:
-            for lstart in range(0, len(positions), interval):
-                lend = min(lstart + interval - 1, len(positions) - 1)
-                pos_start, pos_end = positions[lstart], positions[lend]
+        `interval_bp` > 0 splits by genomic windows of that size instead of `interval` rows.
+        """
 
-                tmp_vcf_path = out_dir.joinpath(f"{chrid}-{lstart}-{lend}.{name}.vcf")
-                split_path = out_dir.joinpath(f"{chrid}-{lstart}-{lend}.{name}{self.SPLIT_SUFFIX}")
+        name = in_path.name[:-len(self.OVERLAP_SUFFIX)]
 
-                print(f"{self.bcftools} filter {in_path} --regions {chrid}:{pos_start}-{pos_end} > {tmp_vcf_path}", file=f)
-                print(f"{self.bcftools} view {tmp_vcf_path} -Oz -o {split_path}", file=f)
-                print(f"{self.tabix} -p vcf {split_path}", file=f)
-                print(f"rm {tmp_vcf_path}", file=f)
+        script_name = f"{'chr' + chrid if chrid[0].isdigit() else chrid}.{name}"
+        regions_path = out_dir.joinpath(f"{script_name}.split.regions")
 
-                split_paths.append(split_path)
+        # NOTE: 所有划分区间写入同一个 regions 文件, 由 `bcftools +scatter` 一次读完整条染色体
+        split_paths = []
+        if interval_bp > 0:
+            # 窗口为 [k * interval_bp + 1, (k + 1) * interval_bp], 二分查找每个窗口的第一个位点, 没有位点的窗口不生成划分
+            lstarts = sorted({
+                bisect_left(positions, k * interval_bp + 1)
+                for k in range((positions[0] - 1) // interval_bp, (positions[-1] - 1) // interval_bp + 1)
+            })
+            lends = [lstart - 1 for lstart in lstarts[1:]]
+            lends.append(len(positions) - 1)
+            pos_starts = [positions[lstart] for lstart in lstarts]
+            pos_ends = [positions[lend] for lend in lends]
+        else:
+            # 步长切片一次取出所有区间的起止位置, 最后一个区间结束于最后一个位点
+            lstarts = range(0, len(positions), interval)
+            lends = [lstart + interval - 1 for lstart in lstarts]
+            lends[-1] = len(positions) - 1
+            pos_starts = positions[::interval]
+            pos_ends = positions[interval - 1::interval]
+            if len(pos_ends) < len(pos_starts):
+                pos_ends.append(positions[-1])
+
+        # 划分数可能很多, 循环内直接拼接字符串, 只在返回时构造 Path
+        out_dir_str = str(out_dir)
+        tabix = str(self.tabix)
+        split_suffix = self.SPLIT_SUFFIX
+
+        regions = []
+        # NOTE: `-r` 通过索引只读取当前染色体, 单文件模式下每个任务不必解压整个基因组
+        commands = [f"{self.bcftools} +scatter {in_path} --threads {self.bcftools_threads} -r {chrid} -S {regions_path} -Oz -o {out_dir_str}"]
+        for lstart, lend, pos_start, pos_end in zip(lstarts, lends, pos_starts, pos_ends):
+            split_name = f"{chrid}-{lstart}-{lend}.{name}"
+            regions.append(f"{chrid}:{pos_start}-{pos_end}\t{split_name}\n")
+
+            split_path = f"{out_dir_str}/{split_name}{split_suffix}"
+            commands.append(f"{tabix} -p vcf {split_path}")
+            split_paths.append(split_path)
+
+        _write_if_changed(regions_path, "".join(regions))
+
+        return list(map(Path, split_paths)), commands
+
+    @staticmethod
+    def _index_paths_by_chrid(paths: List[Path], chrid_list: List[str]) -> Dict[str, List[Path]]:
+        """Group paths by the chrid found in their names.
+
+        All chrids are compiled into one alternation, longest first, so each name is scanned once
+        and `chr10` is preferred over `chr1` at the same position. A chrid only matches as a whole
+        token delimited by non-alphanumeric characters, so chrid `1` does not match inside `sativa133`.
+        """
 
-        return split_paths
+        alternation = "|".join(map(re.escape, sorted(chrid_list, key=len, reverse=True)))
+        chrid_re = re.compile(f"(?<![0-9A-Za-z])(?:{alternation})(?![0-9A-Za-z])")
+
+        index: Dict[str, List[Path]] = {}
+        for p in paths:
+            m = chrid_re.search(p.name)
+            if m is not None:
+                index.setdefault(m.group(), []).append(p)
+        return index
 
     def generate_scripts_split(self, pop1_overlap_paths: List[Path] = None, pop2_overlap_paths: List[Path] = None) -> Tuple[List[Path], List[Path]]:
         if pop1_overlap_paths is None or pop2_overlap_paths is None:
             pop1_overlap_paths, pop2_overlap_paths = self.find_file_pairs(self.overlap_dir, "*" + self.OVERLAP_SUFFIX)
 
-        chrid_list = Path(self.args.chrid_list).read_text().strip().split("\n")
-        interval = int(self.args.interval)
+        chrid_list = self.chrid_list
+        interval = self.interval
+        interval_bp = int(self.args.interval_bp)
 
         split_dir = self.split_dir
         split_dir.mkdir(parents=True, exist_ok=True)
@@ -323,8 +818,7 @@ class XPCLR:
 
         # extract positions from vcfgz files
         logger.info("使用多进程从 *%s 文件中读取位置信息", self.OVERLAP_SUFFIX)
-        chrpos1 = get_chrpos_from_vcfgz_files(pop1_overlap_paths)
-        chrpos2 = get_chrpos_from_vcfgz_files(pop2_overlap_paths)
+        chrpos1, chrpos2 = get_chrpos_from_vcfgz_pairs(pop1_overlap_paths, pop2_overlap_paths, self.bcftools, chrid_list)
 
         # preprocess different vcf.gz count
         _pop1_overlap_paths = pop1_overlap_paths
@@ -340,9 +834,11 @@ class XPCLR:
             if len(_pop1_overlap_paths) > len(chrid_list):
                 logger.warning("发现的文件数 %d 大于染色体数 %d", len(_pop1_overlap_paths), len(chrid_list))
 
+            pop1_index = self._index_paths_by_chrid(_pop1_overlap_paths, chrid_list)
+            pop2_index = self._index_paths_by_chrid(_pop2_overlap_paths, chrid_list)
             for chrid in chrid_list:
-                _p1 = list(filter(lambda x: chrid in x.name, _pop1_overlap_paths))
-                _p2 = list(filter(lambda x: chrid in x.name, _pop2_overlap_paths))
+                _p1 = pop1_index.get(chrid, [])
+                _p2 = pop2_index.get(chrid, [])
                 if len(_p1) != 1:
                     logger.error("染色体 %s 对应的 pop1(%s) 文件不唯一, %s", chrid, self.pop1, _p1)
                     exit(1)
@@ -352,12 +848,30 @@ class XPCLR:
                 pop1_overlap_paths.append(_p1[0])
                 pop2_overlap_paths.append(_p2[0])
 
-        for chrid, p1, p2 in zip(chrid_list, pop1_overlap_paths, pop2_overlap_paths):
-            paths = self._generate_script_split(split_dir, p1, chrid, chrpos1[chrid], interval)
+        # NOTE: 位置数组从字典中取出后只被对应的任务引用, 该染色体的脚本生成完即可释放, 不必等所有染色体完成
+        with futures.ThreadPoolExecutor(_SCRIPT_WORKERS) as executor:
+            fs = [
+                (
+                    executor.submit(self._generate_script_split, split_dir, p1, chrid, chrpos1.pop(chrid), interval, interval_bp),
+                    executor.submit(self._generate_script_split, split_dir, p2, chrid, chrpos2.pop(chrid), interval, interval_bp),
+                )
+                for chrid, p1, p2 in zip(chrid_list, pop1_overlap_paths, pop2_overlap_paths)
+            ]
+
+        # 每个 (染色体, pop) 的划分是作业数组中的一个任务, 全部写入同一个脚本
+        tasks: List[List[str]] = []
+        for f1, f2 in fs:
+            paths, commands = f1.result()
             pop1_split_paths.extend(paths)
+            tasks.append(commands)
 
-            paths = self._generate_script_split(split_dir, p2, chrid, chrpos2[chrid], interval)
+            paths, commands = f2.result()
             pop2_split_paths.extend(paths)
+            tasks.append(commands)
+
+        array_path = self._write_array_script(split_dir.joinpath("split.array.sh"), tasks)
+        self._record_scripts("split", [array_path])
+        logger.info("已生成 split 作业数组脚本 %s, 共 %d 个任务, 可使用 `qsub -t 1-%d` 提交", array_path.resolve(), len(tasks), len(tasks))
 
         logger.info("已生成 pop1(%s) %d 个 split 步骤脚本", self.pop1, len(pop1_split_paths))
         for p in pop1_split_paths:
@@ -368,17 +882,23 @@ class XPCLR:
 
         return pop1_split_paths, pop2_split_paths
 
-    def _generate_script_genomap(self, out_dir: Path, in_path: Path) -> Tuple[Path, Path]:
+    def _generate_script_genomap(self, out_dir: Path, in_path: Path, scripts: Dict[Path, List[str]]) -> Tuple[Path, Path]:
         name = in_path.name[:-len(self.SPLIT_SUFFIX)]
 
-        geno_path = out_dir.joinpath(f"{name}.geno")
-        map_path = out_dir.joinpath(f"{name}.map")
+        # 每个划分文件调用一次, 命令中直接使用字符串路径
+        out_dir_str = str(out_dir)
+        geno_path = f"{out_dir_str}/{name}{self.GENO_SUFFIX}"
+        map_path = f"{out_dir_str}/{name}{self.MAP_SUFFIX}"
 
-        with out_dir.joinpath(f"{'chr' + name if name[0].isdigit() else name}.genomap.sh").open("w", encoding="utf8") as f:
-            print(f"{self.perl} {self.perl_script} {in_path} | sed 's/|/\//g' | sed 's/\// /g' | sed 's/\./9/g' > {geno_path}", file=f)
-            print(f"""{self.bcftools} query -f '%CHROM\\t%POS\\t%REF\\t%ALT\\n' {in_path} | awk '{{print $1"_"$2"\\t9\\t"158.5/204289203*$2"\\t"$2"\\t"$3"\\t"$4}}' > {map_path}""", file=f)
+        # 同一条染色体同一个 pop 的所有划分文件写入同一个脚本
+        m = _SPLIT_NAME_RE.match(name)
+        script_name = f"{m.group(1)}.{m.group(2)}" if m else name
 
-        return geno_path, map_path
+        lines = scripts.setdefault(out_dir.joinpath(f"{'chr' + script_name if script_name[0].isdigit() else script_name}.genomap.sh"), [])
+        lines.append(f"{self.perl} {self.perl_script} {in_path} | sed 's/|/\\//g' | sed 's/\\// /g' | sed 's/\\./9/g' > {geno_path}")
+        lines.append(f"""{self.bcftools} query -f '%CHROM\\t%POS\\t%REF\\t%ALT\\n' {in_path} | awk '{{print $1"_"$2"\\t9\\t"158.5/204289203*$2"\\t"$2"\\t"$3"\\t"$4}}' > {map_path}""")
+
+        return Path(geno_path), Path(map_path)
 
     def generate_scripts_genomap(self, pop1_split_paths: List[Path] = None, pop2_split_paths: List[Path] = None) -> Tuple[List[Path], List[Path], List[Path], List[Path]]:
         """
@@ -398,17 +918,22 @@ class XPCLR:
         pop1_map_paths: List[Path] = []
         pop2_map_paths: List[Path] = []
 
+        scripts: Dict[Path, List[str]] = {}
         for p1, p2 in zip(pop1_split_paths, pop2_split_paths):
-            geno_path, map_path = self._generate_script_genomap(genomap_dir, p1)
+            geno_path, map_path = self._generate_script_genomap(genomap_dir, p1, scripts)
 
             pop1_geno_paths.append(geno_path)
             pop1_map_paths.append(map_path)
 
-            geno_path, map_path = self._generate_script_genomap(genomap_dir, p2)
+            geno_path, map_path = self._generate_script_genomap(genomap_dir, p2, scripts)
 
             pop2_geno_paths.append(geno_path)
             pop2_map_paths.append(map_path)
 
+        with futures.ThreadPoolExecutor(_SCRIPT_WORKERS) as executor:
+            script_paths = list(executor.map(self._write_script, scripts.keys(), scripts.values()))
+        self._record_scripts("genomap", script_paths)
+
         logger.info("已生成 pop1(%s) %d 个 geno & map 步骤脚本", self.pop1, len(pop1_geno_paths) + len(pop1_map_paths))
         for p in pop1_geno_paths:
             logger.info("%s", p.resolve())
@@ -438,7 +963,7 @@ class XPCLR:
             name1 = ".".join(g1.name[:-len(self.GENO_SUFFIX)].split(".")[1:])
             name2 = ".".join(g2.name[:-len(self.GENO_SUFFIX)].split(".")[1:])
             chr_interval = m.name.split(".")[0]
-            chrnum = int(re.search("\d+", chr_interval.split("-")[0]).group())  # XPCLR need integer chrom number
+            chrnum = int(get_chrnum(chr_interval.split("-", 1)[0]))  # XPCLR need integer chrom number
 
             # NOTE: XPCLR Only accepts filenames in current directory, so link geno and map file to current directory
             _link = xpclr_dir.joinpath(g1.name)
@@ -453,8 +978,10 @@ class XPCLR:
 
             xpclr_path = xpclr_dir.joinpath(f"{chr_interval}.{name1}_{name2}")  # Suffix ".xpclr.txt" will be auto added by XPCLR
 
-            with xpclr_dir.joinpath(f"{'chr' + chr_interval if chr_interval[0].isdigit() else chr_interval}.{name1}_{name2}.xpclr.sh").open("w", encoding="utf8") as f:
-                print(f"{self.xpclr} -xpclr {g1.name} {g2.name} {m.name} {xpclr_path.name} -w1 0.005 100 2000 {chrnum} -p0 0.7", file=f)  # Only accept filename, not filepath
+            script_path = self._write_script(xpclr_dir.joinpath(f"{'chr' + chr_interval if chr_interval[0].isdigit() else chr_interval}.{name1}_{name2}.xpclr.sh"), [
+                f"{self.xpclr} -xpclr {g1.name} {g2.name} {m.name} {xpclr_path.name} -w1 0.005 100 2000 {chrnum} -p0 0.7",  # Only accept filename, not filepath
+            ])
+            self._record_scripts("xpclr", [script_path])
 
             xpclr_paths.append(xpclr_path)
 
@@ -472,16 +999,32 @@ class XPCLR:
         pop1_map_paths, pop2_map_paths = None, None
         xpclr_paths = None
 
-        if args.run_filter:
+        # NOTE: 后一步骤依赖前一步骤的输出文件, 因此每生成一个步骤就立即执行
+        if args.run_filter and args.run_overlap:
+            # filter 和 overlap 一次遍历生成, 执行时仍按步骤顺序先 filter 后 overlap
+            pop1_overlap_paths, pop2_overlap_paths = self.generate_scripts_filter_overlap()
+            if self.execute:
+                self.execute_scripts()
+        elif args.run_filter:
             pop1_filter_paths, pop2_filter_paths = self.generate_scripts_filter()
-        if args.run_overlap:
+            if self.execute:
+                self.execute_scripts()
+        elif args.run_overlap:
             pop1_overlap_paths, pop2_overlap_paths = self.generate_scripts_overlap(pop1_filter_paths, pop2_filter_paths)
+            if self.execute:
+                self.execute_scripts()
         if args.run_split:
             pop1_split_paths, pop2_split_paths = self.generate_scripts_split(pop1_overlap_paths, pop2_overlap_paths)
+            if self.execute:
+                self.execute_scripts()
         if args.run_genomap:
             pop1_geno_paths, pop2_geno_paths, pop1_map_paths, pop2_map_paths = self.generate_scripts_genomap(pop1_split_paths, pop2_split_paths)
+            if self.execute:
+                self.execute_scripts()
         if args.run_xpclr:
             xpclr_paths = self.generate_scripts_xpclr(pop1_geno_paths, pop2_geno_paths, pop1_map_paths)
+            if self.execute:
+                self.execute_scripts()
 
 
 if __name__ == "__main__":
@@ -500,13 +1043,16 @@ if __name__ == "__main__":
 
     parser.add_argument("--chrid-list", type=Path, default="chrid.list", help="一个文本文件, 有一列数据, 是需要进行 split 操作的染色体 id, 与 vcf 文件中保持一致. 默认为 `%(default)s`.")
     parser.add_argument("--interval", type=int, default=200000, help="进行 split 操作时, 每个划分文件最大的行数. 默认为 `%(default)s`.")
+    parser.add_argument("--interval-bp", type=int, default=0, help="进行 split 操作时, 改为按基因组坐标划分, 每个划分文件覆盖的碱基数, 设置后忽略 `--interval`. 默认为 `%(default)s`, 即按行数划分.")
 
     parser.add_argument("--bcftools", type=Path, default="bcftools", help="bcftools, 默认为 `%(default)s`.")
-    parser.add_argument("--vcftools", type=Path, default="vcftools", help="vcftools, 默认为 `%(default)s`.")
+    parser.add_argument("--vcftools", type=Path, default=None, help="已弃用, overlap 步骤已改用 `bcftools isec` 和 `bcftools view -T`, 该参数不再生效, 仅为兼容旧的命令行保留.")
     parser.add_argument("--tabix", type=Path, default="tabix", help="tabix, 默认为 `%(default)s`.")
+    parser.add_argument("--bgzip", type=Path, default="bgzip", help="bgzip, 默认为 `%(default)s`.")
     parser.add_argument("--perl", type=Path, default="perl", help="perl, 默认为 `%(default)s`.")
     parser.add_argument("--perl-script", type=Path, default="/ldfssz1/ST_EARTH/P18Z10200N0148/P18Z10200N0148_LETTUCE/final_combine/dp2-50/29.xp-clr/vcf2geno.v20200716.pl", help="用于 geno 操作的 perl 脚本, 默认为 `%(default)s`.")
     parser.add_argument("--xpclr", type=Path, default="/hwfssz1/ST_EARTH/Reference/ST_AGRIC/USER/liuxinjiang/liuxinjiang/APP/software/XPCLR/bin/XPCLR", help="XPCLR, 默认为 `%(default)s`")
+    parser.add_argument("--bcftools-threads", type=int, default=4, help="生成的 bcftools filter/view/+scatter 命令使用的压缩/解压线程数, 默认为 `%(default)s`.")
 
     parser.add_argument("--run-filter", action="store_true", help="生成 filter 操作脚本.")
     parser.add_argument("--run-overlap", action="store_true", help="生成 overlap 操作脚本.")
@@ -514,12 +1060,18 @@ if __name__ == "__main__":
     parser.add_argument("--run-genomap", action="store_true", help="生成 geno 和 map 操作脚本.")
     parser.add_argument("--run-xpclr", action="store_true", help="生成 xpclr 操作脚本.")
 
+    parser.add_argument("--execute", action="store_true", help="生成脚本后立即按步骤顺序执行, 默认只生成脚本.")
+    parser.add_argument("--jobs", type=int, default=4, help="执行时同一步骤内并行运行的脚本数, 默认为 `%(default)s`.")
+
     args = parser.parse_args()
 
     logger.info("XPCLR 脚本开始运行, 版本 v%s", __version__)
     logger.info("本次运行全部参数为")
     logger.info("%s", args)
 
+    if args.vcftools is not None:
+        logger.warning("--vcftools 参数已弃用, overlap 步骤使用 bcftools isec 和 bcftools view -T, 忽略 %s", args.vcftools)
+
     if not (args.run_filter or args.run_overlap or args.run_split or args.run_genomap or args.run_xpclr):
         logger.warning("没有指定运行任何步骤, 已结束运行.")
     else: